@@ -3,9 +3,15 @@ from ultralytics import YOLO
 from PIL import Image
 import tempfile
 import cv2
+from autotune import apply_cpu_profile
+
+WEIGHTS = "C:/Users/dell/Desktop/astro_guard/AstroGuard/runs/detect/train5/weights/best.pt"
+
+# Thread count and CPU affinity tuned by autotune.py for single requests
+apply_cpu_profile('latency', model=WEIGHTS)
 
 # Load the YOLOv8 model
-model = YOLO("C:/Users/dell/Desktop/astro_guard/AstroGuard/runs/detect/train5/weights/best.pt")
+model = YOLO(WEIGHTS)
 
 
 # Streamlit UI
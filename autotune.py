@@ -0,0 +1,297 @@
+import argparse
+import multiprocessing as mp
+import os
+import platform
+import time
+from pathlib import Path
+from queue import Empty
+
+import numpy as np
+import torch
+import yaml
+from ultralytics import YOLO
+
+PROFILE_FILE = 'cpu_profile.yaml'
+# Which deployment slot this process is, used to pick its CPUs in multi-process layouts
+WORKER_ENV = 'ASTROGUARD_WORKER'
+LAYOUTS = ['none', 'compact', 'spread']
+BATCHES = [1, 4, 8]
+WARMUP = 2
+# Seconds a configuration may take before its workers are considered stuck
+TIMEOUT = 600
+# Formats whose inference runs on torch's thread pools; ONNX Runtime and OpenVINO
+# sessions built by Ultralytics ignore torch.set_num_threads and set_num_interop_threads
+TORCH_SUFFIXES = ['.pt', '.torchscript']
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count()))
+
+
+def affinity_cpus(layout, processes, threads, worker, cpus=None):
+    """CPUs for one worker, or None to leave scheduling to the OS.
+
+    'compact' gives each worker a contiguous block of CPUs, 'spread'
+    interleaves the workers across all CPUs.
+    """
+    if layout == 'none' or not hasattr(os, 'sched_setaffinity'):
+        return None
+    cpus = cpus or available_cpus()
+    if layout == 'compact':
+        block = cpus[worker * threads:(worker + 1) * threads]
+    else:
+        block = cpus[worker % processes::processes][:threads]
+    return block or None
+
+
+def apply_threads(threads, interop_threads, cpus=None, torch_threads=True):
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    if not torch_threads:
+        return
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        # Can only be set once per process, before any inter-op work has started
+        pass
+
+
+def apply_cpu_profile(mode='latency', profile_path=None, model=None, imgsz=640):
+    """Apply a configuration written by autotune.py.
+
+    'latency' and 'throughput' are single-process, one-image-per-call settings
+    for app.py, the GUI and predict.py; 'server' is the best multi-process
+    layout and needs ASTROGUARD_WORKER set in each process. Does nothing when
+    there is no profile or it was tuned on a machine with a different CPU
+    count, and says so when it was tuned for another `model` or `imgsz`.
+    Returns the applied configuration, or None.
+    """
+    path = Path(profile_path) if profile_path else Path(__file__).parent / PROFILE_FILE
+    if not path.exists():
+        return None
+    with open(path, 'r') as file:
+        profile = yaml.safe_load(file)
+    if not isinstance(profile, dict):
+        print(f"CPU profile {path} is empty or malformed, ignoring it")
+        return None
+    config = profile.get(mode)
+    if config is None:
+        return None
+    if profile.get('cpu_count') != os.cpu_count():
+        print(f"CPU profile {path} was tuned for {profile.get('cpu_count')} CPUs, this machine has {os.cpu_count()}, ignoring it")
+        return None
+    if model is not None and profile.get('model') is not None and Path(model).resolve() != Path(profile['model']).resolve():
+        print(f"CPU profile {path} was tuned for {profile['model']}, applying it to {model}")
+    if profile.get('imgsz') is not None and profile['imgsz'] != imgsz:
+        print(f"CPU profile {path} was tuned at imgsz={profile['imgsz']}, applying it at imgsz={imgsz}")
+    if config['processes'] > 1 and WORKER_ENV not in os.environ:
+        print(f"CPU profile '{mode}' is for {config['processes']} processes, set {WORKER_ENV} in each one, ignoring it")
+        return None
+    worker = int(os.environ.get(WORKER_ENV, 0))
+    if not 0 <= worker < config['processes']:
+        print(f"{WORKER_ENV}={worker} is outside the {config['processes']} processes of CPU profile '{mode}', ignoring it")
+        return None
+    cpus = affinity_cpus(config['affinity'], config['processes'], config['threads'], worker)
+    apply_threads(config['threads'], config['interop_threads'], cpus, profile.get('torch_threads', True))
+    return config
+
+
+def bench_worker(model_path, threads, interop_threads, cpus, batches, iters, imgsz, barrier, queue):
+    # Runs in its own process so thread pools and affinity start fresh
+    try:
+        apply_threads(threads, interop_threads, cpus, is_torch_model(model_path))
+        model = YOLO(model_path, task='detect')
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 256, (imgsz, imgsz, 3), dtype=np.uint8) for _ in range(max(batches))]
+        results = {}
+        for batch in batches:
+            barrier.wait()
+            for _ in range(WARMUP):
+                model.predict(images[:batch], imgsz=imgsz, verbose=False)
+            barrier.wait()
+            start = time.monotonic()
+            latencies = []
+            for _ in range(iters):
+                t = time.perf_counter()
+                model.predict(images[:batch], imgsz=imgsz, verbose=False)
+                latencies.append(time.perf_counter() - t)
+            results[batch] = (start, time.monotonic(), latencies)
+    except Exception as e:
+        # Break the barrier so the other workers stop waiting for this one
+        barrier.abort()
+        queue.put(f"{type(e).__name__}: {e}")
+        return
+    queue.put(results)
+
+
+def bench_config(model_path, processes, threads, interop_threads, layout, batches, iters, imgsz, timeout=TIMEOUT):
+    """Benchmark one process/thread/affinity layout across all batch sizes.
+
+    Returns one result per batch size with the combined throughput of all
+    processes and the per-request latency seen by each, or an empty list when
+    a worker fails, dies or exceeds `timeout` seconds.
+    """
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(processes, timeout=timeout)
+    queue = ctx.Queue()
+    workers = []
+    for worker in range(processes):
+        cpus = affinity_cpus(layout, processes, threads, worker)
+        p = ctx.Process(target=bench_worker,
+                        args=(str(model_path), threads, interop_threads, cpus, batches, iters, imgsz, barrier, queue))
+        p.start()
+        workers.append(p)
+
+    outputs = []
+    error = None
+    deadline = time.monotonic() + timeout
+    while len(outputs) < processes and error is None:
+        try:
+            out = queue.get(timeout=1)
+        except Empty:
+            dead = [p.exitcode for p in workers if p.exitcode not in (None, 0)]
+            if dead:
+                error = f"worker exited with code {dead[0]}"
+            elif time.monotonic() > deadline:
+                error = f"timed out after {timeout}s"
+            continue
+        if isinstance(out, str):
+            error = out
+        else:
+            outputs.append(out)
+    for p in workers:
+        if error is not None and p.is_alive():
+            p.terminate()
+        p.join()
+    if error is not None:
+        print(f"  skipped: {error}")
+        return []
+
+    rows = []
+    for batch in batches:
+        starts, ends, latencies = zip(*(out[batch] for out in outputs))
+        latencies = np.concatenate(latencies) * 1000
+        wall = max(ends) - min(starts)
+        rows.append({
+            'processes': processes,
+            'threads': threads,
+            'interop_threads': interop_threads,
+            'batch': batch,
+            'affinity': layout,
+            'images_per_s': round(processes * iters * batch / wall, 2),
+            'latency_ms': round(float(np.median(latencies)), 2),
+            'latency_p90_ms': round(float(np.percentile(latencies, 90)), 2),
+        })
+    return rows
+
+
+def is_torch_model(model_path):
+    return Path(model_path).suffix in TORCH_SUFFIXES
+
+
+def sweep_threads(torch_backed, threads, processes, n_cpus):
+    """Thread counts to benchmark for one process count.
+
+    Exported ONNX/OpenVINO models ignore torch's thread settings, so for them
+    the count is fixed to an equal share of the CPUs per process, which is
+    still the block each process gets under the affinity layouts.
+    """
+    if torch_backed:
+        return [t for t in threads if processes * t <= n_cpus]
+    return [max(1, n_cpus // processes)]
+
+
+def default_grid(n_cpus):
+    threads = sorted({t for t in [1, 2, 4, 8, 16, n_cpus // 2, n_cpus] if 1 <= t <= n_cpus})
+    processes = sorted({p for p in [1, 2, 4, n_cpus // 2] if 1 <= p <= n_cpus})
+    return threads, processes
+
+
+def latest_weights(this_dir):
+    # Most recently trained best.pt, like the weights predict.py would offer
+    weights = list((this_dir / "runs" / "detect").glob("train*/weights/best.pt"))
+    if len(weights) == 0:
+        raise ValueError("No trained weights found, pass --model")
+    return max(weights, key=lambda p: p.stat().st_mtime)
+
+
+if __name__ == '__main__':
+    n_cpus = len(available_cpus())
+    threads_grid, processes_grid = default_grid(n_cpus)
+    layouts = LAYOUTS if hasattr(os, 'sched_setaffinity') else ['none']
+    parser = argparse.ArgumentParser()
+    # model
+    parser.add_argument('--model', type=str, default=None, help='best.pt or exported model to tune (default: latest training run)')
+    # threads
+    parser.add_argument('--threads', type=int, nargs='+', default=threads_grid, help='Intra-op thread counts per process')
+    # interop
+    parser.add_argument('--interop', type=int, nargs='+', default=[1], help='Inter-op thread counts per process')
+    # processes
+    parser.add_argument('--processes', type=int, nargs='+', default=processes_grid, help='Numbers of processes running side by side')
+    # batch
+    parser.add_argument('--batch', type=int, nargs='+', default=BATCHES, help='Batch sizes')
+    # affinity
+    parser.add_argument('--affinity', type=str, nargs='+', default=layouts, choices=LAYOUTS, help='CPU affinity layouts')
+    # iters
+    parser.add_argument('--iters', type=int, default=10, help='Timed batches per configuration')
+    # imgsz
+    parser.add_argument('--imgsz', type=int, default=640, help='Inference image size')
+    # timeout
+    parser.add_argument('--timeout', type=float, default=TIMEOUT, help='Seconds before a configuration is skipped as stuck')
+    args = parser.parse_args()
+    # Resolve --model against the caller's working directory before moving to the script directory
+    model_path = Path(args.model).resolve() if args.model else None
+    this_dir = Path(__file__).resolve().parent
+    os.chdir(this_dir)
+    model_path = model_path or latest_weights(this_dir)
+    torch_backed = is_torch_model(model_path)
+    interops = args.interop if torch_backed else [1]
+    if not torch_backed:
+        print(f"{model_path.name} does not use torch's thread settings, sweeping processes, batch sizes and affinity with n_cpus / processes CPUs per process")
+
+    rows = []
+    seen = set()
+    for processes in args.processes:
+        if processes > n_cpus:
+            continue
+        for threads in sweep_threads(torch_backed, args.threads, processes, n_cpus):
+            for layout in args.affinity:
+                # Skip layouts that pin exactly the same CPUs as one already measured
+                key = (processes, threads, tuple(tuple(affinity_cpus(layout, processes, threads, w) or ()) for w in range(processes)))
+                if key in seen:
+                    continue
+                seen.add(key)
+                for interop in interops:
+                    print(f"Benchmarking processes={processes} threads={threads} interop={interop} affinity={layout}")
+                    for row in bench_config(model_path, processes, threads, interop, layout, args.batch, args.iters, args.imgsz, args.timeout):
+                        print(f"  batch={row['batch']}: {row['images_per_s']} img/s, {row['latency_ms']} ms p50, {row['latency_p90_ms']} ms p90")
+                        rows.append(row)
+
+    if len(rows) == 0:
+        raise ValueError("No configuration fits on this machine or all of them failed, check --model, --threads and --processes")
+    profile = {
+        'model': str(model_path),
+        'machine': platform.node(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'imgsz': args.imgsz,
+        'torch_threads': torch_backed,
+    }
+    # predict.py, app.py and the GUI are one process predicting one image per call
+    single = [r for r in rows if r['processes'] == 1 and r['batch'] == 1]
+    if single:
+        profile['throughput'] = max(single, key=lambda r: r['images_per_s'])
+        profile['latency'] = min(single, key=lambda r: r['latency_ms'])
+    else:
+        print("No single-process batch 1 configuration measured, the profile has no 'throughput' or 'latency' entry")
+    profile['server'] = max(rows, key=lambda r: r['images_per_s'])
+    profile_path = this_dir / PROFILE_FILE
+    with open(profile_path, 'w') as f:
+        yaml.safe_dump(profile, f, sort_keys=False)
+    for mode in ['throughput', 'latency', 'server']:
+        if mode in profile:
+            print(f"{mode}: {profile[mode]}")
+    print(f"CPU profile saved in {profile_path}")
@@ -0,0 +1,365 @@
+import argparse
+import json
+import os
+import shutil
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+SPLITS = ['train', 'val', 'test']
+# Mirrors ultralytics.data.utils.IMG_FORMATS so the index lists the same images as its directory scan
+IMAGE_SUFFIXES = ['.bmp', '.dng', '.jpeg', '.jpg', '.mpo', '.png', '.tif', '.tiff', '.webp', '.pfm']
+INDEX_DIR = 'dataset_index'
+INDEX_VERSION = 2
+# Upper edges of the box-size bins, as sqrt(w * h) of the normalized YOLO box
+BOX_SIZE_BINS = [0.02, 0.05, 0.1, 0.2, 0.4, 1.0]
+HASH_THRESHOLD = 4
+
+
+# Difference hash: 64 bits comparing neighbouring pixels of a 9x8 thumbnail
+def dhash(gray):
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def box_size_bin(w, h):
+    size = (max(w, 0.0) * max(h, 0.0)) ** 0.5
+    for i, edge in enumerate(BOX_SIZE_BINS):
+        if size <= edge:
+            return i
+    return len(BOX_SIZE_BINS) - 1
+
+
+def read_labels(label_path, nc):
+    class_counts = [0] * nc
+    box_hist = [0] * len(BOX_SIZE_BINS)
+    if not label_path.exists():
+        return class_counts, box_hist
+    with open(label_path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            cls_id = int(float(parts[0]))
+            if 0 <= cls_id < nc:
+                class_counts[cls_id] += 1
+            box_hist[box_size_bin(float(parts[3]), float(parts[4]))] += 1
+    return class_counts, box_hist
+
+
+def index_image(img_path):
+    gray = cv2.imread(str(img_path), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None
+    return {
+        'width': int(gray.shape[1]),
+        'height': int(gray.shape[0]),
+        'phash': f"{dhash(gray):016x}",
+    }
+
+
+def file_stamp(path):
+    # (mtime_ns, size) or None when the file is missing
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def load_index(index_path):
+    if not index_path.exists():
+        return None
+    with open(index_path, 'r') as f:
+        index = json.load(f)
+    if index.get('version') != INDEX_VERSION:
+        return None
+    return index
+
+
+def index_is_stale(index_path, split_dir):
+    """Cheap check for images or labels added, removed or renamed since indexing.
+
+    Compares the directory mtimes against the index file, so files edited in
+    place are only picked up by a full run of index_dataset.py.
+    """
+    index_mtime = index_path.stat().st_mtime_ns
+    for sub in ['images', 'labels']:
+        stamp = file_stamp(split_dir / sub)
+        if stamp is not None and stamp[0] > index_mtime:
+            return True
+    return False
+
+
+def refresh_split(split_dir, index_path, nc, rebuild=False):
+    """Build or incrementally refresh the index of one split.
+
+    Only images whose file stamp changed since the last run are decoded, and
+    only labels whose stamp changed are re-read; removed images are dropped.
+    Images that fail to decode are remembered and skipped until they change.
+    Returns (index, number of images decoded).
+    """
+    images_dir = split_dir / 'images'
+    labels_dir = split_dir / 'labels'
+    old = None if rebuild else load_index(index_path)
+    if old is not None and (old['root'] != str(split_dir) or old['nc'] != nc):
+        old = None
+    old_images = old['images'] if old is not None else {}
+    old_unreadable = old['unreadable'] if old is not None else {}
+
+    images = {}
+    unreadable = {}
+    updated = 0
+    with os.scandir(images_dir) as it:
+        names = sorted(e.name for e in it if e.is_file() and Path(e.name).suffix.lower() in IMAGE_SUFFIXES)
+    for name in names:
+        img_path = images_dir / name
+        label_path = labels_dir / Path(name).with_suffix('.txt').name
+        stamp = file_stamp(img_path)
+        label_stamp = file_stamp(label_path)
+        if old_unreadable.get(name) == stamp:
+            # Already failed to decode and unchanged since, don't retry
+            unreadable[name] = stamp
+            continue
+        entry = old_images.get(name)
+        if entry is None or entry['stamp'] != stamp:
+            entry = index_image(img_path)
+            if entry is None:
+                print(f"Skipping unreadable image {img_path}")
+                unreadable[name] = stamp
+                continue
+            entry['stamp'] = stamp
+            entry['class_counts'], entry['box_hist'] = read_labels(label_path, nc)
+            entry['label_stamp'] = label_stamp
+            updated += 1
+        elif entry['label_stamp'] != label_stamp:
+            # Label-only changes don't need the image decoded again
+            entry['class_counts'], entry['box_hist'] = read_labels(label_path, nc)
+            entry['label_stamp'] = label_stamp
+        images[name] = entry
+
+    index = {
+        'version': INDEX_VERSION,
+        'root': str(split_dir),
+        'nc': nc,
+        'box_size_bins': BOX_SIZE_BINS,
+        'images': images,
+        'unreadable': unreadable,
+    }
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+    return index, updated
+
+
+def near_duplicates(index, threshold=HASH_THRESHOLD):
+    """Greedily prune images whose perceptual hash is close to a kept image.
+
+    Images are visited in name order; an image is dropped only if it is within
+    `threshold` bits of an image already kept, so a slowly drifting sequence
+    keeps a frame every `threshold` bits instead of collapsing into one. The
+    64-bit hash is cut into threshold + 1 bands; two hashes within the
+    threshold must agree exactly on at least one band, so only kept images
+    sharing a band bucket are compared. Returns {kept name: [dropped names]}
+    for every kept image with at least one near-duplicate.
+    """
+    n_bands = threshold + 1
+    edges = [round(64 * b / n_bands) for b in range(n_bands + 1)]
+    bands = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(edges[:-1], edges[1:])]
+    buckets = [{} for _ in bands]
+    kept_hashes = {}
+    groups = {}
+    for name in sorted(index['images']):
+        h = int(index['images'][name]['phash'], 16)
+        keys = [(h >> lo) & mask for lo, mask in bands]
+        match = None
+        for bucket, key in zip(buckets, keys):
+            for kept in bucket.get(key, []):
+                if bin(h ^ kept_hashes[kept]).count('1') <= threshold and (match is None or kept < match):
+                    match = kept
+        if match is not None:
+            groups.setdefault(match, []).append(name)
+            continue
+        kept_hashes[name] = h
+        for bucket, key in zip(buckets, keys):
+            bucket.setdefault(key, []).append(name)
+    return groups
+
+
+def split_list(index, groups=None):
+    # Absolute image paths for the split, without the images pruned as near-duplicates.
+    # Images OpenCV could not decode stay listed, as the directory scan would find them too.
+    drop = set()
+    for dropped in (groups or {}).values():
+        drop.update(dropped)
+    images_dir = Path(index['root']) / 'images'
+    return [str(images_dir / name) for name in sorted([*index['images'], *index.get('unreadable', {})]) if name not in drop]
+
+
+def mirror_split(split_dir, names, mirror_dir):
+    """Link the given images and their labels under mirror_dir/images and mirror_dir/labels.
+
+    Ultralytics derives label paths, and so its labels.cache, from the image
+    paths. A pruned list pointing into the original split would share the full
+    split's cache and invalidate it on every switch; the mirror gets its own.
+    Uses symlinks, or copies where they can't be created (e.g. Windows without
+    symlink rights). Returns the mirrored image paths.
+    """
+    label_names = [Path(name).with_suffix('.txt').name for name in names]
+    for sub, files in [('images', names), ('labels', label_names)]:
+        src_dir = split_dir / sub
+        dst_dir = mirror_dir / sub
+        dst_dir.mkdir(parents=True, exist_ok=True)
+        keep = set()
+        for name in files:
+            src = src_dir / name
+            if not src.exists():
+                # Images without a label file are background images
+                continue
+            keep.add(name)
+            dst = dst_dir / name
+            if dst.is_symlink():
+                if os.readlink(dst) == str(src):
+                    continue
+            elif dst.exists() and file_stamp(dst) == file_stamp(src):
+                continue
+            if dst.is_symlink() or dst.exists():
+                dst.unlink()
+            try:
+                os.symlink(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+        with os.scandir(dst_dir) as it:
+            stale = [e.path for e in it if e.name not in keep]
+        for path in stale:
+            os.unlink(path)
+    return [str(mirror_dir / 'images' / name) for name in names]
+
+
+def report(split, index, groups, names):
+    images = index['images'].values()
+    class_counts = np.sum([e['class_counts'] for e in images], axis=0) if images else np.zeros(index['nc'], int)
+    box_hist = np.sum([e['box_hist'] for e in images], axis=0) if images else np.zeros(len(BOX_SIZE_BINS), int)
+    sizes = {}
+    for e in images:
+        key = f"{e['width']}x{e['height']}"
+        sizes[key] = sizes.get(key, 0) + 1
+    dup_images = sum(len(dropped) for dropped in groups.values())
+
+    print(f"[{split}] {len(index['images'])} images")
+    print("  image sizes: " + ", ".join(f"{k}: {v}" for k, v in sorted(sizes.items(), key=lambda kv: -kv[1])))
+    print("  labels per class: " + ", ".join(f"{names[i]}: {int(c)}" for i, c in enumerate(class_counts)))
+    lo = 0.0
+    parts = []
+    for edge, count in zip(BOX_SIZE_BINS, box_hist):
+        parts.append(f"{lo:g}-{edge:g}: {int(count)}")
+        lo = edge
+    print("  box size histogram (sqrt(w*h)): " + ", ".join(parts))
+    print(f"  near-duplicate groups: {len(groups)} ({dup_images} redundant images)")
+    for kept, dropped in sorted(groups.items(), key=lambda kv: -len(kv[1]))[:10]:
+        print(f"    {kept} ~ {', '.join(dropped[:5])}{' ...' if len(dropped) > 5 else ''}")
+
+
+def data_yaml_from_index(this_dir, dedup=False, dedup_eval=False, threshold=HASH_THRESHOLD, splits=SPLITS):
+    """Write split list files and a data yaml from the cached index.
+
+    The yaml points Ultralytics at the list files, so training and validation
+    read image paths from the index instead of scanning the split directories.
+    `dedup` prunes near-duplicates from train only, so metrics stay comparable
+    with earlier runs; `dedup_eval` also prunes val and test. Only `splits` are
+    refreshed and listed, the others keep their directories, and a subset gets
+    its own yaml so the full one is left alone. Returns the path of the yaml.
+    """
+    this_dir = Path(this_dir)
+    index_dir = this_dir / INDEX_DIR
+    with open(this_dir / 'yolo_params.yaml', 'r') as file:
+        params = yaml.safe_load(file)
+    index_dir.mkdir(parents=True, exist_ok=True)
+
+    data = dict(params)
+    for split in splits:
+        if params.get(split) is None:
+            continue
+        index_path = index_dir / f"{split}.json"
+        index = load_index(index_path)
+        if index is None:
+            # Unindexed splits keep their directory and are scanned as before
+            print(f"No index for split '{split}' in {index_dir}, falling back to {params[split]}")
+            continue
+        split_dir = Path(params[split])
+        if index['root'] != str(split_dir) or index['nc'] != params['nc']:
+            # Built for another dataset, rebuild it from the split yolo_params.yaml points at
+            if not (split_dir / 'images').is_dir():
+                print(f"Index for split '{split}' was built for {index['root']} and {split_dir / 'images'} does not exist, falling back to {params[split]}")
+                continue
+            print(f"Index for split '{split}' was built for {index['root']}, rebuilding it for {split_dir}")
+            index, updated = refresh_split(split_dir, index_path, params['nc'])
+        elif index_is_stale(index_path, split_dir):
+            print(f"Index for split '{split}' is older than {split_dir}, refreshing it")
+            index, updated = refresh_split(split_dir, index_path, params['nc'])
+        prune = dedup if split == 'train' else dedup_eval
+        if prune:
+            paths = split_list(index, near_duplicates(index, threshold))
+            paths = mirror_split(split_dir, [Path(p).name for p in paths], index_dir / f"{split}_dedup")
+            list_path = index_dir / f"{split}_dedup.txt"
+        else:
+            paths = split_list(index)
+            list_path = index_dir / f"{split}.txt"
+        with open(list_path, 'w') as f:
+            f.write("\n".join(paths) + "\n")
+        data[split] = str(list_path)
+
+    if dedup_eval:
+        name = 'data_dedup_all' if dedup else 'data_dedup_eval'
+    else:
+        name = 'data_dedup' if dedup else 'data'
+    if list(splits) != SPLITS:
+        name += '_' + '_'.join(splits)
+    data_path = index_dir / f"{name}.yaml"
+    with open(data_path, 'w') as f:
+        yaml.safe_dump(data, f, sort_keys=False)
+    return data_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    # splits
+    parser.add_argument('--splits', nargs='+', default=SPLITS, choices=SPLITS, help='Splits to index')
+    # rebuild
+    parser.add_argument('--rebuild', action='store_true', help='Ignore the cached index and re-read every image')
+    # threshold
+    parser.add_argument('--threshold', type=int, default=HASH_THRESHOLD, help='Max hash bit difference for near-duplicates')
+    # dedup
+    parser.add_argument('--dedup', action='store_true', help='Also write a deduplicated train split and data_dedup.yaml')
+    # dedup_eval
+    parser.add_argument('--dedup_eval', action='store_true', help='Also deduplicate val and test (changes the evaluation set)')
+    args = parser.parse_args()
+    this_dir = Path(__file__).parent
+    os.chdir(this_dir)
+    with open(this_dir / 'yolo_params.yaml', 'r') as file:
+        params = yaml.safe_load(file)
+    names = params['names']
+
+    for split in args.splits:
+        if params.get(split) is None:
+            print(f"No {split} field found in yolo_params.yaml, skipping")
+            continue
+        split_dir = Path(params[split])
+        if not (split_dir / 'images').is_dir():
+            print(f"Images directory {split_dir / 'images'} does not exist, skipping")
+            continue
+        index, updated = refresh_split(split_dir, this_dir / INDEX_DIR / f"{split}.json", params['nc'], args.rebuild)
+        print(f"Indexed {split}: {updated} of {len(index['images'])} images re-read, {len(index['unreadable'])} unreadable")
+        report(split, index, near_duplicates(index, args.threshold), names)
+
+    data_path = data_yaml_from_index(this_dir)
+    print(f"Index data file saved in {data_path}")
+    if args.dedup or args.dedup_eval:
+        data_path = data_yaml_from_index(this_dir, dedup=args.dedup, dedup_eval=args.dedup_eval, threshold=args.threshold)
+        print(f"Deduplicated data file saved in {data_path}")
@@ -3,6 +3,8 @@ from pathlib import Path
 import cv2
 import os
 import yaml
+from index_dataset import INDEX_DIR, data_yaml_from_index
+from autotune import apply_cpu_profile
 
 
 # Function to predict and save images
@@ -73,6 +75,8 @@ if __name__ == '__main__':
         idx = choice
 
     model_path = detect_path / train_folders[idx] / "weights" / "best.pt"
+    # Thread count and CPU affinity tuned by autotune.py for batch jobs
+    apply_cpu_profile('throughput', model=model_path)
     model = YOLO(model_path)
 
     # Directory with images
@@ -97,4 +101,7 @@ if __name__ == '__main__':
     print(f"Bounding box labels saved in {labels_output_dir}")
     data = this_dir / 'yolo_params.yaml'
     print(f"Model parameters saved in {data}")
+    # Validate from the dataset index when one has been built, to skip the directory scan
+    if (this_dir / INDEX_DIR / 'test.json').exists():
+        data = data_yaml_from_index(this_dir, splits=['test'])
     metrics = model.val(data=data, split="test")
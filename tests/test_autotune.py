@@ -0,0 +1,91 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+pytest.importorskip('torch')
+pytest.importorskip('ultralytics')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import autotune
+from autotune import WORKER_ENV, affinity_cpus, apply_cpu_profile, default_grid, sweep_threads
+
+needs_affinity = pytest.mark.skipif(not hasattr(os, 'sched_setaffinity'), reason='CPU affinity is Linux only')
+
+
+@needs_affinity
+def test_affinity_layouts():
+    cpus = list(range(8))
+    assert [affinity_cpus('compact', 2, 4, w, cpus) for w in range(2)] == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert [affinity_cpus('spread', 2, 4, w, cpus) for w in range(2)] == [[0, 2, 4, 6], [1, 3, 5, 7]]
+    assert affinity_cpus('compact', 1, 2, 0, [4, 5, 6, 7]) == [4, 5]
+    assert affinity_cpus('none', 1, 8, 0, cpus) is None
+
+
+def test_grids():
+    assert default_grid(8) == ([1, 2, 4, 8], [1, 2, 4])
+    assert default_grid(1) == ([1], [1])
+    assert sweep_threads(True, [1, 2, 4, 8], 2, 8) == [1, 2, 4]
+    # Exported models get one CPU share per process instead of a thread sweep
+    assert sweep_threads(False, [1, 2, 4, 8], 2, 8) == [4]
+    assert sweep_threads(False, [1, 2, 4, 8], 16, 8) == [1]
+
+
+def write_profile(tmp_path, **entries):
+    profile = {'model': str(tmp_path / 'best.pt'), 'cpu_count': os.cpu_count(), 'imgsz': 640, 'torch_threads': True}
+    profile.update(entries)
+    path = tmp_path / 'cpu_profile.yaml'
+    path.write_text(yaml.safe_dump(profile))
+    return path
+
+
+def config(processes=1, threads=2):
+    return {'processes': processes, 'threads': threads, 'interop_threads': 1, 'batch': 1, 'affinity': 'none'}
+
+
+@pytest.fixture
+def applied(monkeypatch):
+    calls = []
+    monkeypatch.setattr(autotune, 'apply_threads', lambda *args: calls.append(args))
+    monkeypatch.delenv(WORKER_ENV, raising=False)
+    return calls
+
+
+def test_apply_profile(tmp_path, applied, capsys):
+    path = write_profile(tmp_path, latency=config(threads=2))
+    assert apply_cpu_profile('latency', path, model=tmp_path / 'best.pt') == config(threads=2)
+    assert applied == [(2, 1, None, True)]
+    assert capsys.readouterr().out == ''
+
+    # Another model or image size is reported but still applied
+    assert apply_cpu_profile('latency', path, model=tmp_path / 'other.pt', imgsz=320) is not None
+    out = capsys.readouterr().out
+    assert 'other.pt' in out and 'imgsz=320' in out
+
+
+def test_apply_profile_rejections(tmp_path, applied, monkeypatch):
+    assert apply_cpu_profile('latency', tmp_path / 'missing.yaml') is None
+    (tmp_path / 'empty.yaml').write_text('')
+    assert apply_cpu_profile('latency', tmp_path / 'empty.yaml') is None
+    (tmp_path / 'list.yaml').write_text('- 1\n- 2\n')
+    assert apply_cpu_profile('latency', tmp_path / 'list.yaml') is None
+
+    path = write_profile(tmp_path, latency=config(), server=config(processes=2))
+    assert apply_cpu_profile('throughput', path) is None
+    # Multi-process entries need a valid worker slot
+    assert apply_cpu_profile('server', path) is None
+    monkeypatch.setenv(WORKER_ENV, '2')
+    assert apply_cpu_profile('server', path) is None
+    monkeypatch.setenv(WORKER_ENV, '-1')
+    assert apply_cpu_profile('server', path) is None
+
+    path = write_profile(tmp_path, cpu_count=os.cpu_count() + 1, latency=config())
+    assert apply_cpu_profile('latency', path) is None
+    assert applied == []
+
+    monkeypatch.setenv(WORKER_ENV, '1')
+    path = write_profile(tmp_path, server=config(processes=2), torch_threads=False)
+    assert apply_cpu_profile('server', path) is not None
+    assert applied == [(2, 1, None, False)]
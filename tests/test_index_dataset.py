@@ -0,0 +1,156 @@
+import os
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from index_dataset import INDEX_DIR, data_yaml_from_index, index_is_stale, near_duplicates, refresh_split, split_list
+
+
+def make_index(hashes):
+    return {
+        'root': '/data/train',
+        'nc': 3,
+        'images': {f"{i:03d}.png": {'phash': f"{h:016x}"} for i, h in enumerate(hashes)},
+    }
+
+
+def test_exact_duplicates_are_pruned():
+    index = make_index([0xffff0000ffff0000, 0xffff0000ffff0000, 0x0123456789abcdef, 0xffff0000ffff0007])
+    groups = near_duplicates(index, threshold=4)
+    assert groups == {'000.png': ['001.png', '003.png']}
+    assert split_list(index, groups) == ['/data/train/images/000.png', '/data/train/images/002.png']
+
+
+def test_drifting_sequence_is_not_collapsed():
+    # Each frame flips 3 fresh bits, so frame 0 and frame 19 are 57 bits apart
+    hashes = [0]
+    for i in range(1, 20):
+        hashes.append(hashes[-1] ^ (0b111 << (3 * (i - 1))))
+    index = make_index(hashes)
+    groups = near_duplicates(index, threshold=4)
+    kept = [Path(p).name for p in split_list(index, groups)]
+
+    assert len(kept) == 10
+    kept_hashes = [int(index['images'][name]['phash'], 16) for name in kept]
+    for i, a in enumerate(kept_hashes):
+        for b in kept_hashes[i + 1:]:
+            assert bin(a ^ b).count('1') > 4
+    for name, dropped in groups.items():
+        for other in dropped:
+            diff = int(index['images'][name]['phash'], 16) ^ int(index['images'][other]['phash'], 16)
+            assert bin(diff).count('1') <= 4
+
+
+def test_refresh_reuses_cached_entries(tmp_path):
+    split_dir = tmp_path / 'train'
+    (split_dir / 'images').mkdir(parents=True)
+    (split_dir / 'labels').mkdir()
+    img = np.zeros((32, 48, 3), dtype=np.uint8)
+    img[:, 24:] = 255
+    cv2.imwrite(str(split_dir / 'images' / 'a.png'), img)
+    (split_dir / 'labels' / 'a.txt').write_text("0 0.5 0.5 0.1 0.1\n")
+    (split_dir / 'images' / 'broken.png').write_bytes(b"not an image")
+    index_path = tmp_path / 'train.json'
+
+    index, updated = refresh_split(split_dir, index_path, 3)
+    assert updated == 1
+    assert index['images']['a.png']['width'] == 48
+    assert index['images']['a.png']['class_counts'] == [1, 0, 0]
+    assert list(index['unreadable']) == ['broken.png']
+
+    # Unreadable images are not retried, label-only edits don't decode the image
+    (split_dir / 'labels' / 'a.txt').write_text("2 0.5 0.5 0.1 0.1\n2 0.5 0.5 0.9 0.9\n")
+    index, updated = refresh_split(split_dir, index_path, 3)
+    assert updated == 0
+    assert index['images']['a.png']['class_counts'] == [0, 0, 2]
+    assert list(index['unreadable']) == ['broken.png']
+
+
+def test_stale_index_is_refreshed(tmp_path):
+    split_dir = tmp_path / 'data' / 'train'
+    (split_dir / 'images').mkdir(parents=True)
+    (split_dir / 'labels').mkdir()
+    img = np.zeros((16, 16, 3), dtype=np.uint8)
+    cv2.imwrite(str(split_dir / 'images' / 'a.png'), img)
+    (tmp_path / 'yolo_params.yaml').write_text(f"train: {split_dir}\nnc: 3\nnames: ['a', 'b', 'c']\n")
+    index_path = tmp_path / INDEX_DIR / 'train.json'
+    refresh_split(split_dir, index_path, 3)
+    assert not index_is_stale(index_path, split_dir)
+
+    # An image added after indexing makes the images directory newer than the index
+    cv2.imwrite(str(split_dir / 'images' / 'b.png'), img)
+    mtime = index_path.stat().st_mtime_ns - 10 ** 9
+    os.utime(index_path, ns=(mtime, mtime))
+    assert index_is_stale(index_path, split_dir)
+
+    data_path = data_yaml_from_index(tmp_path)
+    listed = (tmp_path / INDEX_DIR / 'train.txt').read_text().split()
+    assert [Path(p).name for p in listed] == ['a.png', 'b.png']
+    assert str(data_path).endswith('data.yaml')
+
+
+def test_index_for_another_root_is_rebuilt(tmp_path):
+    img = np.zeros((16, 16, 3), dtype=np.uint8)
+    for name in ['old', 'new']:
+        (tmp_path / name / 'images').mkdir(parents=True)
+        (tmp_path / name / 'labels').mkdir()
+        cv2.imwrite(str(tmp_path / name / 'images' / f"{name}.png"), img)
+    refresh_split(tmp_path / 'old', tmp_path / INDEX_DIR / 'train.json', 3)
+    (tmp_path / 'yolo_params.yaml').write_text(f"train: {tmp_path / 'new'}\nnc: 3\nnames: ['a', 'b', 'c']\n")
+
+    data_yaml_from_index(tmp_path)
+    listed = (tmp_path / INDEX_DIR / 'train.txt').read_text().split()
+    assert listed == [str(tmp_path / 'new' / 'images' / 'new.png')]
+
+
+def test_list_matches_directory_scan_formats(tmp_path):
+    split_dir = tmp_path / 'train'
+    (split_dir / 'images').mkdir(parents=True)
+    img = np.zeros((16, 16, 3), dtype=np.uint8)
+    for name in ['a.bmp', 'b.JPG', 'c.tif', 'd.webp']:
+        cv2.imwrite(str(split_dir / 'images' / name), img)
+    (split_dir / 'images' / 'e.dng').write_bytes(b"raw")
+    (split_dir / 'images' / 'notes.txt').write_text("not an image")
+
+    index, _ = refresh_split(split_dir, tmp_path / 'train.json', 3)
+    assert [Path(p).name for p in split_list(index)] == ['a.bmp', 'b.JPG', 'c.tif', 'd.webp', 'e.dng']
+
+
+def test_subset_of_splits_leaves_others_alone(tmp_path):
+    img = np.zeros((16, 16, 3), dtype=np.uint8)
+    for split in ['train', 'test']:
+        (tmp_path / split / 'images').mkdir(parents=True)
+        cv2.imwrite(str(tmp_path / split / 'images' / f"{split}.png"), img)
+        refresh_split(tmp_path / split, tmp_path / INDEX_DIR / f"{split}.json", 3)
+    (tmp_path / 'yolo_params.yaml').write_text(
+        f"train: {tmp_path / 'train'}\ntest: {tmp_path / 'test'}\nnc: 3\nnames: ['a', 'b', 'c']\n")
+
+    data_path = data_yaml_from_index(tmp_path, splits=['test'])
+    assert data_path.name == 'data_test.yaml'
+    assert (tmp_path / INDEX_DIR / 'test.txt').exists()
+    assert not (tmp_path / INDEX_DIR / 'train.txt').exists()
+    assert not (tmp_path / INDEX_DIR / 'data.yaml').exists()
+
+
+def test_pruned_split_gets_its_own_label_dir(tmp_path):
+    split_dir = tmp_path / 'train'
+    (split_dir / 'images').mkdir(parents=True)
+    (split_dir / 'labels').mkdir()
+    img = np.zeros((16, 16, 3), dtype=np.uint8)
+    img[:, 8:] = 255
+    for name in ['a', 'b']:
+        cv2.imwrite(str(split_dir / 'images' / f"{name}.png"), img)
+        (split_dir / 'labels' / f"{name}.txt").write_text("0 0.5 0.5 0.1 0.1\n")
+    refresh_split(split_dir, tmp_path / INDEX_DIR / 'train.json', 3)
+    (tmp_path / 'yolo_params.yaml').write_text(f"train: {split_dir}\nnc: 3\nnames: ['a', 'b', 'c']\n")
+
+    data_yaml_from_index(tmp_path, dedup=True)
+    listed = (tmp_path / INDEX_DIR / 'train_dedup.txt').read_text().split()
+    mirror = tmp_path / INDEX_DIR / 'train_dedup'
+    assert listed == [str(mirror / 'images' / 'a.png')]
+    # Ultralytics maps .../images/a.png to .../labels/a.txt and caches next to that directory
+    assert (mirror / 'labels' / 'a.txt').read_text() == "0 0.5 0.5 0.1 0.1\n"
+    assert sorted(p.name for p in (mirror / 'images').iterdir()) == ['a.png']
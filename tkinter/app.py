@@ -8,8 +8,12 @@ import pathlib
 import math
 import threading
 import time
+import sys
 from datetime import datetime
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from autotune import apply_cpu_profile
+
 
 class StarField:
     """Animated starfield background for space theme"""
@@ -484,6 +488,9 @@ if __name__ == "__main__":
     # Replace with your actual model path
     WEIGHTS = r"C:\Users\ritig\OneDrive\Desktop\CodeClash\AstroGuard\best.pt"
     
+    # Thread count and CPU affinity tuned by autotune.py for single images
+    apply_cpu_profile('latency', model=WEIGHTS)
+
     try:
         app = AstroGuardApp(WEIGHTS)
         app.mainloop()
@@ -9,6 +9,7 @@ import argparse
 from ultralytics import YOLO
 import os
 import sys
+from index_dataset import data_yaml_from_index
 
 if __name__ == '__main__': 
     parser = argparse.ArgumentParser()
@@ -26,12 +27,22 @@ if __name__ == '__main__':
     parser.add_argument('--lrf', type=float, default=LRF, help='Final learning rate')
     # single_cls
     parser.add_argument('--single_cls', type=bool, default=SINGLE_CLS, help='Single class training')
+    # index
+    parser.add_argument('--index', action='store_true', help='Read splits from the dataset_index cache instead of scanning directories')
+    # dedup
+    parser.add_argument('--dedup', action='store_true', help='Train on the near-duplicate pruned train split, linked under dataset_index/train_dedup with its own label cache (implies --index)')
+    # dedup_eval
+    parser.add_argument('--dedup_eval', action='store_true', help='Also prune val and test, metrics are then not comparable with earlier runs (implies --index)')
     args = parser.parse_args()
     this_dir = os.path.dirname(__file__)
     os.chdir(this_dir)
+    data = os.path.join(this_dir, "yolo_params.yaml")
+    if args.index or args.dedup or args.dedup_eval:
+        # Build list files from index_dataset.py output so the splits are not rescanned
+        data = str(data_yaml_from_index(this_dir, dedup=args.dedup, dedup_eval=args.dedup_eval))
     model = YOLO(os.path.join(this_dir, "yolov8m.pt"))
     results = model.train(
-    data=os.path.join(this_dir, "yolo_params.yaml"), 
+    data=data, 
     epochs=args.epochs,
     device=0,
     batch=8,                 # ✅ Safe for Colab